@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Compare decode time and response size of the json, csv and msgpack
+query response formats on a synthetic numeric result.
+"""
+import io
+import csv
+import json
+import struct
+import timeit
+
+from pyinflux.client.formats import decode_csv, decode_msgpack, HAVE_MSGPACK
+
+ROWS = 100000
+
+
+def make_result():
+    values = [[1500000000000000000 + i * 1000000000, i * 0.5, i] for i in range(ROWS)]
+    return {'results': [{'statement_id': 0, 'series': [
+        {'name': 'cpu', 'tags': {'host': 'serverA'},
+         'columns': ['time', 'value', 'count'], 'values': values}]}]}
+
+
+def to_csv(result):
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator='\n')
+    for statement in result['results']:
+        for series in statement['series']:
+            tags = ",".join(k + "=" + v for k, v in series.get('tags', {}).items())
+            writer.writerow(['name', 'tags'] + series['columns'])
+            for row in series['values']:
+                writer.writerow([series['name'], tags] + row)
+    return buf.getvalue().encode('utf-8')
+
+
+def pack(obj, out):
+    """Tiny MessagePack encoder for the types in the benchmark result"""
+    if obj is None:
+        out.append(b'\xc0')
+    elif isinstance(obj, bool):
+        out.append(b'\xc3' if obj else b'\xc2')
+    elif isinstance(obj, int):
+        out.append(struct.pack('>Bq', 0xd3, obj))
+    elif isinstance(obj, float):
+        out.append(struct.pack('>Bd', 0xcb, obj))
+    elif isinstance(obj, str):
+        data = obj.encode('utf-8')
+        out.append(struct.pack('>BI', 0xdb, len(data)) + data)
+    elif isinstance(obj, list):
+        out.append(struct.pack('>BI', 0xdd, len(obj)))
+        for item in obj:
+            pack(item, out)
+    elif isinstance(obj, dict):
+        out.append(struct.pack('>BI', 0xdf, len(obj)))
+        for key, value in obj.items():
+            pack(key, out)
+            pack(value, out)
+    return out
+
+
+def bench(name, data, decode, repeat=3):
+    seconds = min(timeit.repeat(lambda: decode(data), number=1, repeat=repeat))
+    print("{:<20} {:>10.1f} KiB {:>10.3f} s".format(name, len(data) / 1024, seconds))
+
+
+if __name__ == '__main__':
+    result = make_result()
+    json_data = json.dumps(result).encode('utf-8')
+    csv_data = to_csv(result)
+    msgpack_data = b''.join(pack(result, []))
+
+    assert decode_csv(csv_data.decode('utf-8')) == result
+    assert decode_msgpack(msgpack_data, accelerated=False) == result
+
+    bench('json', json_data, lambda d: json.loads(d.decode('utf-8')))
+    bench('csv', csv_data, lambda d: decode_csv(d.decode('utf-8')))
+    bench('msgpack (python)', msgpack_data, lambda d: decode_msgpack(d, accelerated=False))
+    if HAVE_MSGPACK:
+        bench('msgpack (native)', msgpack_data, decode_msgpack)
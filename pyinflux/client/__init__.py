@@ -1,11 +1,18 @@
 import typing
 import io
 import re
-from urllib.request import urlopen
+from urllib.error import HTTPError
+from urllib.request import urlopen, Request
 from urllib.parse import quote as urlquote, urlencode
 import json
 import codecs
 
+from pyinflux.client.formats import MIME_TYPES, decode_csv, decode_msgpack
+
+
+class QueryError(Exception):
+    pass
+
 
 class Line(object):
     def __init__(self, key, tags, fields, timestamp=None):
@@ -77,10 +84,13 @@ class Line(object):
 class QueryResultOption:
     CODEC = codecs.getreader('utf-8')
 
-    def __init__(self, exec_func: typing.Callable[[], io.IOBase]):
+    def __init__(self, exec_func: typing.Callable[[], io.IOBase], response_format: str = 'json'):
         self.exec_func = exec_func
+        self.response_format = response_format
         self._json = None
         self._text = None
+        self._csv = None
+        self._msgpack = None
 
     def as_json(self):
         if self._json is None:
@@ -96,8 +106,162 @@ class QueryResultOption:
             fh.close()
         return self._text
 
+    def as_csv(self):
+        if self._csv is None:
+            fh = self.CODEC(self.exec_func())
+            self._csv = decode_csv(fh.read())
+            fh.close()
+        return self._csv
+
+    def as_msgpack(self):
+        if self._msgpack is None:
+            fh = self.exec_func()
+            self._msgpack = decode_msgpack(fh.read())
+            fh.close()
+        return self._msgpack
+
+    def as_results(self):
+        """
+        Decode the response according to the negotiated format. The result
+        has the same structure as ``as_json()`` for every format.
+        """
+        if self.response_format == 'csv':
+            return self.as_csv()
+        if self.response_format == 'msgpack':
+            return self.as_msgpack()
+        return self.as_json()
+
+
+NOT_EXECUTED = 'not executed'
+
+
+class StatementResult:
+    """
+    Lazy result of one statement of a ``QueryBatch``. The batch request is
+    sent on first access and its decoded response is shared by all handles.
+    """
+
+    def __init__(self, group: 'QueryBatch._Group', statement_id: int, query: str):
+        self._group = group
+        self.statement_id = statement_id
+        self.query = query
+
+    @property
+    def error(self) -> typing.Optional[str]:
+        return self._group.statement(self.statement_id).get('error')
+
+    def result(self) -> dict:
+        """
+        Return the statement result ``{'statement_id': .., 'series': [..]}``,
+        raises ``QueryError`` if the statement failed.
+        """
+        statement = self._group.statement(self.statement_id)
+        if 'error' in statement:
+            raise QueryError(statement['error'])
+        return statement
+
+    def series(self) -> [dict]:
+        return self.result().get('series', [])
+
+
+class QueryBatch:
+    """
+    Collects statements and sends them as one semicolon-joined request per
+    database. A failing statement only fails its own handle: statements
+    InfluxDB reports as not executed after it are sent again, and a request
+    rejected as a whole (e.g. a syntax error) is retried statement by statement.
+    """
+
+    class _Group:
+        def __init__(self, batch: 'QueryBatch', db: str):
+            self.batch = batch
+            self.db = db
+            self.queries = []
+            self._statements = None
+
+        def statement(self, statement_id: int) -> dict:
+            if self._statements is None:
+                self._statements = [dict(statement, statement_id=i)
+                                    for i, statement in enumerate(self._run(self.queries))]
+            return self._statements[statement_id]
+
+        def _send(self, queries: [str]) -> (dict, bool):
+            """
+            Send one request, returns the decoded response and whether the
+            server rejected the request as a whole (HTTP 400).
+            """
+            query = ";".join(queries)
+            response_format = self.batch.response_format
+            if self.db is None:
+                result = self.batch.influx.execute(query, response_format)
+            else:
+                result = self.batch.influx.query_db(self.db, query, response_format)
+            try:
+                return result.as_results(), False
+            except HTTPError as e:
+                body = e.read()
+                try:
+                    if response_format == 'msgpack':
+                        response = decode_msgpack(body)
+                    else:
+                        response = json.loads(body.decode('utf-8'))
+                except (ValueError, TypeError):
+                    response = None
+                if isinstance(response, dict) and 'error' in response:
+                    return {'error': response['error']}, e.code == 400
+                return {'error': str(e)}, False
+            except (OSError, ValueError) as e:
+                return {'error': str(e)}, False
+
+        def _run(self, queries: [str]) -> [dict]:
+            response, rejected = self._send(queries)
+            if 'error' in response:
+                if rejected and len(queries) > 1:
+                    # one invalid statement fails the whole request, run them one by one
+                    return [statement for query in queries for statement in self._run([query])]
+                return [{'error': response['error']} for _ in queries]
+            statements = {statement.get('statement_id', i): statement
+                          for i, statement in enumerate(response.get('results', []))}
+            results = []
+            for i in range(len(queries)):
+                statement = statements.get(i, {'error': 'no result for statement'})
+                if i > 0 and statement.get('error') == NOT_EXECUTED:
+                    # InfluxDB stops at the first failing statement, send the rest again
+                    results.extend(self._run(queries[i:]))
+                    break
+                results.append(statement)
+            return results
+
+    def __init__(self, influx: 'Influx', db: str = None, response_format: str = 'json'):
+        """
+        :param db: default database of added statements
+        :param response_format: 'json' or 'msgpack', csv responses don't carry statement ids
+        """
+        if response_format == 'csv':
+            raise ValueError('csv responses can not be split by statement')
+        self.influx = influx
+        self.db = db
+        self.response_format = response_format
+        self._groups = {}
+
+    def add(self, query: str, db: str = None) -> StatementResult:
+        db = db if db is not None else self.db
+        group = self._groups.get(db)
+        if group is None or group._statements is not None:
+            group = self._groups[db] = self._Group(self, db)
+        query = query.strip().rstrip(';')
+        group.queries.append(query)
+        return StatementResult(group, len(group.queries) - 1, query)
+
+    def execute(self):
+        """Send all pending requests now instead of on first access"""
+        for group in self._groups.values():
+            group.statement(0)
+
 
 class Influx:
+    MAX_GET_URL_LENGTH = 2048
+
     def __init__(self, host: str, port: int = 8086, username: str = None, password: str = None):
         """
         :param username: username and password:
@@ -118,18 +282,46 @@ class Influx:
             response = fh.read()
             return response.decode('utf-8')
 
-    def query_db(self, db: str, query: str) -> QueryResultOption:
+    @staticmethod
+    def _query_params(response_format: str, epoch: str) -> dict:
+        if epoch is None and response_format != 'json':
+            epoch = 'ns'
+        return {'epoch': epoch} if epoch else {}
+
+    def query_db(self, db: str, query: str, response_format: str = 'json',
+                 epoch: str = None) -> QueryResultOption:
+        """
+        :param response_format: one of 'json', 'csv' or 'msgpack', sent as Accept header
+        :param epoch: precision of returned times, e.g. 'ns'. Defaults to RFC3339 strings
+        for json and to 'ns' for csv and msgpack, pass 'ns' to get the same times in every format.
+        """
+        headers = {'Accept': MIME_TYPES[response_format]}
+        params = self._query_params(response_format, epoch)
+
         def get_fh() -> io.IOBase:
-            url = self._query_url_get + 'db=' + urlquote(db) + '&q=' + urlquote(query)
-            return urlopen(url)
+            url = self._query_url_get + urlencode(dict({'db': db}, **params)) + '&q=' + urlquote(query)
+            if len(url) <= self.MAX_GET_URL_LENGTH:
+                return urlopen(Request(url, headers=headers))
+            data = urlencode(dict({'db': db, 'q': query}, **params)).encode('utf-8')
+            return urlopen(Request(self._query_url_post, data, headers=headers))
 
-        return QueryResultOption(get_fh)
+        return QueryResultOption(get_fh, response_format)
+
+    def execute(self, query: str, response_format: str = 'json', epoch: str = None) -> QueryResultOption:
+        headers = {'Accept': MIME_TYPES[response_format]}
+        params = self._query_params(response_format, epoch)
 
-    def execute(self, query: str) -> QueryResultOption:
         def get_fh() -> io.IOBase:
-            return urlopen(self._query_url_post, urlencode({'q': query}).encode('utf-8'))
+            data = urlencode(dict({'q': query}, **params)).encode('utf-8')
+            return urlopen(Request(self._query_url_post, data, headers=headers))
 
-        return QueryResultOption(get_fh)
+        return QueryResultOption(get_fh, response_format)
+
+    def batch(self, db: str = None, response_format: str = 'json') -> QueryBatch:
+        """
+        Start a ``QueryBatch``, statements without database are sent with ``execute``
+        """
+        return QueryBatch(self, db, response_format)
 
 
 class InfluxDB(Influx):
@@ -143,5 +335,8 @@ class InfluxDB(Influx):
     def write(self, lines: [Line]):
         return self.write_db(self._db, lines)
 
-    def query(self, query: str):
-        return self.query_db(self._db, query)
+    def query(self, query: str, response_format: str = 'json', epoch: str = None):
+        return self.query_db(self._db, query, response_format, epoch)
+
+    def batch(self, db: str = None, response_format: str = 'json') -> QueryBatch:
+        return super().batch(db if db is not None else self._db, response_format)
@@ -0,0 +1,257 @@
+"""
+Decoders for the response formats InfluxDB can answer a query with.
+
+Every decoder returns the same structure as the JSON response:
+``{'results': [{'statement_id': 0, 'series': [{'name': ..., 'tags': {...},
+'columns': [...], 'values': [[...], ...]}]}]}``
+
+Times are expected as nanosecond integers, the client requests csv and
+msgpack with ``epoch=ns``.
+"""
+import csv
+import io
+import struct
+
+try:
+    import msgpack as _msgpack
+    HAVE_MSGPACK = True
+except ImportError:
+    _msgpack = None
+    HAVE_MSGPACK = False
+
+MIME_TYPES = {
+    'json': 'application/json',
+    'csv': 'application/csv',
+    'msgpack': 'application/x-msgpack',
+}
+
+
+def _csv_value(value: str):
+    if value == '':
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    if value == 'true':
+        return True
+    if value == 'false':
+        return False
+    return value
+
+
+def _csv_int(value: str):
+    return int(value) if value else None
+
+
+def _csv_float(value: str):
+    return float(value) if value else None
+
+
+def _csv_unknown(value: str):
+    if value:
+        raise ValueError(value)
+    return None
+
+
+def _csv_converter(value: str, converter):
+    """
+    Return ``converter`` if it can convert ``value``, otherwise a wider
+    converter for the column.
+    """
+    if value == '':
+        return converter
+    for candidate in (converter, _csv_int, _csv_float):
+        if candidate is _csv_int and converter is _csv_float:
+            continue
+        try:
+            candidate(value)
+            return candidate
+        except ValueError:
+            pass
+    return _csv_value
+
+
+def _csv_tags(tags: str) -> dict:
+    return dict(tag.split('=', 1) for tag in tags.split(','))
+
+
+def decode_csv(text: str) -> dict:
+    """
+    Decode a response sent with ``Accept: application/csv``.
+
+    The CSV format loses information compared to JSON: InfluxDB leaves out
+    statements without series and separates both statements and column
+    changes by a blank line and a new ``name,tags,<columns>`` header, so
+    statement ids can't be recovered and all series are returned in a
+    single result with ``statement_id`` 0. Field types are inferred from
+    the text, a string field ``"1"`` decodes as the integer 1.
+    An ``error`` block raises ``QueryError``.
+
+    A converter is picked per column from the first values and only widened
+    when a value doesn't fit, instead of trying int and float on every cell.
+    Still this is several times slower than ``json.loads``, CSV only saves
+    work on the server side.
+    """
+    series_list = []
+    columns = None
+    converters = None
+    series = None
+    series_key = None
+    rows = csv.reader(io.StringIO(text))
+    for row in rows:
+        if not row:
+            continue
+        if row == ['error']:
+            # pyinflux.client imports this module, import on use
+            from pyinflux.client import QueryError
+            message = next(rows, ['unknown error'])
+            raise QueryError(",".join(message))
+        if row[:2] == ['name', 'tags']:
+            columns = row[2:]
+            converters = [_csv_unknown] * len(columns)
+            series = None
+            continue
+        if columns is None or len(row) != len(columns) + 2:
+            raise ValueError('unexpected csv row: {!r}'.format(row))
+        key = (row[0], row[1])
+        if series is None or key != series_key:
+            series = {'name': row[0], 'columns': columns, 'values': []}
+            if row[1]:
+                series['tags'] = _csv_tags(row[1])
+            series_list.append(series)
+            series_key = key
+        values = row[2:]
+        try:
+            series['values'].append([convert(v) for convert, v in zip(converters, values)])
+        except ValueError:
+            # the first value of a column or one not fitting its column
+            converters = [_csv_converter(v, convert) for convert, v in zip(converters, values)]
+            series['values'].append([convert(v) for convert, v in zip(converters, values)])
+    if not series_list:
+        return {'results': [{'statement_id': 0}]}
+    return {'results': [{'statement_id': 0, 'series': series_list}]}
+
+
+class MsgpackDecodeError(ValueError):
+    pass
+
+
+def _msgpack_ext(code: int, data: bytes):
+    """
+    Decode the time extensions to integer nanoseconds: -1 is the
+    MessagePack timestamp, 5 is ``time.Time`` as written by InfluxDB
+    (int64 seconds and uint32 nanoseconds). Other extensions decode to
+    ``(type, data)``.
+    """
+    if code == -1:
+        if len(data) == 4:
+            return struct.unpack('>I', data)[0] * 1000000000
+        if len(data) == 8:
+            value = struct.unpack('>Q', data)[0]
+            return (value & 0x3ffffffff) * 1000000000 + (value >> 34)
+        if len(data) == 12:
+            nsec, sec = struct.unpack('>Iq', data)
+            return sec * 1000000000 + nsec
+    if code == 5 and len(data) == 12:
+        sec, nsec = struct.unpack('>qI', data)
+        return sec * 1000000000 + nsec
+    return code, bytes(data)
+
+
+class _MsgpackReader:
+    """
+    Minimal pure python MessagePack decoder, used when the ``msgpack``
+    package is not installed. It is a compatibility fallback and decodes
+    several times slower than ``json.loads``.
+    """
+    _fixed = {
+        0xca: ('>f', 4), 0xcb: ('>d', 8),
+        0xcc: ('>B', 1), 0xcd: ('>H', 2), 0xce: ('>I', 4), 0xcf: ('>Q', 8),
+        0xd0: ('>b', 1), 0xd1: ('>h', 2), 0xd2: ('>i', 4), 0xd3: ('>q', 8),
+    }
+    _lengths = {0xd9: ('>B', 1), 0xda: ('>H', 2), 0xdb: ('>I', 4),
+                0xc4: ('>B', 1), 0xc5: ('>H', 2), 0xc6: ('>I', 4),
+                0xc7: ('>B', 1), 0xc8: ('>H', 2), 0xc9: ('>I', 4),
+                0xdc: ('>H', 2), 0xdd: ('>I', 4),
+                0xde: ('>H', 2), 0xdf: ('>I', 4)}
+    _fixext = {0xd4: 1, 0xd5: 2, 0xd6: 4, 0xd7: 8, 0xd8: 16}
+
+    def __init__(self, data: bytes):
+        self.data = memoryview(data)
+        self.pos = 0
+
+    def _take(self, n: int) -> memoryview:
+        start = self.pos
+        end = start + n
+        if end > len(self.data):
+            raise MsgpackDecodeError('unexpected end of data')
+        self.pos = end
+        return self.data[start:end]
+
+    def _unpack(self, fmt: str, n: int):
+        return struct.unpack(fmt, self._take(n))[0]
+
+    def read(self):
+        b = self._take(1)[0]
+        if b <= 0x7f:
+            return b
+        if b >= 0xe0:
+            return b - 0x100
+        if 0xa0 <= b <= 0xbf:
+            return str(self._take(b & 0x1f), 'utf-8')
+        if 0x90 <= b <= 0x9f:
+            return [self.read() for _ in range(b & 0x0f)]
+        if 0x80 <= b <= 0x8f:
+            return self._map(b & 0x0f)
+        if b == 0xc0:
+            return None
+        if b == 0xc2:
+            return False
+        if b == 0xc3:
+            return True
+        if b in self._fixed:
+            return self._unpack(*self._fixed[b])
+        if b in self._fixext:
+            code = self._unpack('>b', 1)
+            return _msgpack_ext(code, self._take(self._fixext[b]))
+        if b in self._lengths:
+            n = self._unpack(*self._lengths[b])
+            if b in (0xd9, 0xda, 0xdb):
+                return str(self._take(n), 'utf-8')
+            if b in (0xc4, 0xc5, 0xc6):
+                return bytes(self._take(n))
+            if b in (0xc7, 0xc8, 0xc9):
+                code = self._unpack('>b', 1)
+                return _msgpack_ext(code, self._take(n))
+            if b in (0xdc, 0xdd):
+                return [self.read() for _ in range(n)]
+            return self._map(n)
+        raise MsgpackDecodeError('invalid type byte 0x{:02x}'.format(b))
+
+    def _map(self, n: int) -> dict:
+        result = {}
+        for _ in range(n):
+            key = self.read()
+            result[key] = self.read()
+        return result
+
+
+def decode_msgpack(data: bytes, accelerated: bool = True) -> dict:
+    """
+    Decode a response sent with ``Accept: application/x-msgpack``. Uses the
+    ``msgpack`` package if it is installed and ``accelerated`` is set, the
+    pure python decoder otherwise.
+    """
+    if accelerated and HAVE_MSGPACK:
+        return _msgpack.unpackb(data, raw=False, timestamp=2, strict_map_key=False,
+                                ext_hook=_msgpack_ext)
+    reader = _MsgpackReader(data)
+    result = reader.read()
+    if reader.pos != len(reader.data):
+        raise MsgpackDecodeError('extra data after object')
+    return result
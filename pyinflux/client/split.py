@@ -0,0 +1,279 @@
+"""
+Split a ``SELECT`` over a long time range into windows, run them
+concurrently and merge the per-window series back in time order.
+
+Only queries whose results are independent per window can be split: raw
+selects, row-wise math functions and aggregates with ``GROUP BY time(...)``
+(windows are aligned to the interval and offset). The time range must be
+one lower and one upper ``time`` bound joined by AND at the top level of
+the WHERE clause. Aggregates without ``GROUP BY time``, functions using
+previous values (``derivative``, ``difference``, ...), ``fill(previous)``,
+``fill(linear)``, ``LIMIT``/``OFFSET``/``SLIMIT``/``SOFFSET`` and
+subqueries raise ``ValueError``.
+"""
+import collections
+import itertools
+import re
+import typing
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from pyinflux.client import QueryError
+
+UNITS = {'ns': 1, 'u': 1000, 'µ': 1000, 'ms': 1000000, 's': 1000000000,
+         'm': 60 * 1000000000, 'h': 3600 * 1000000000,
+         'd': 86400 * 1000000000, 'w': 7 * 86400 * 1000000000}
+
+_UNIT = r'(?:ns|u|µ|ms|s|m|h|d|w)'
+_TIME_CONDITION = re.compile(r"\btime\s*(>=|>|<=|<)\s*('[^']*'|-?\d+" + _UNIT + r"?)", re.IGNORECASE)
+_DURATION = re.compile(r'-?(?:\d+' + _UNIT + ')+')
+_GROUP_BY = re.compile(r"\bgroup\s+by\b", re.IGNORECASE)
+_GROUP_BY_TIME = re.compile(r"\btime\s*\(([^)]*)\)", re.IGNORECASE)
+_LIMIT = re.compile(r"\b(?:s?limit|s?offset)\s+\d+", re.IGNORECASE)
+_SUBQUERY = re.compile(r"\bfrom\s*\(", re.IGNORECASE)
+_FIELDS = re.compile(r"^\s*select\s+(.*?)\s+from\b", re.IGNORECASE | re.DOTALL)
+_FUNCTION = re.compile(r'"?(\w+)"?\s*\(')
+_DISTINCT = re.compile(r"\bdistinct\b", re.IGNORECASE)
+_FILL_CARRY = re.compile(r"\bfill\s*\(\s*(?:previous|linear)\s*\)", re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^'\\]|\\.)*'")
+_WHERE = re.compile(r"\bwhere\b", re.IGNORECASE)
+_WHERE_END = re.compile(r"\b(?:group\s+by|order\s+by|s?limit|s?offset|fill|tz)\b", re.IGNORECASE)
+_OR = re.compile(r"\bor\b", re.IGNORECASE)
+_ORDER_DESC = re.compile(r"\border\s+by\s+time\s+desc\b", re.IGNORECASE)
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# functions computed per row, they give the same result in any window
+ROW_FUNCTIONS = {'abs', 'acos', 'asin', 'atan', 'atan2', 'ceil', 'cos', 'exp', 'floor',
+                 'ln', 'log', 'log2', 'log10', 'pow', 'round', 'sin', 'sqrt', 'tan'}
+# functions depending on the previous point or bucket, wrong at window bounds
+CARRY_FUNCTIONS = {'derivative', 'non_negative_derivative', 'difference',
+                   'non_negative_difference', 'cumulative_sum', 'moving_average',
+                   'elapsed', 'integral', 'holt_winters', 'holt_winters_with_fit'}
+
+
+def _mask_strings(query: str) -> str:
+    """
+    Blank the content of single quoted strings, keeping positions, so
+    keywords inside string literals don't match.
+    """
+    return _STRING.sub(lambda m: "'" + '_' * (len(m.group(0)) - 2) + "'", query)
+
+
+def parse_time(literal: str) -> int:
+    """
+    Convert an InfluxQL time literal (epoch with optional unit or quoted
+    RFC3339 string) to nanoseconds since epoch.
+    """
+    if literal.startswith("'"):
+        text = literal.strip("'").replace('Z', '+00:00')
+        nanos = 0
+        match = re.search(r'\.(\d+)', text)
+        if match:
+            nanos = int(match.group(1)[:9].ljust(9, '0'))
+            text = text[:match.start()] + text[match.end():]
+        dt = datetime.fromisoformat(text)
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        delta = dt - _EPOCH
+        return (delta.days * 86400 + delta.seconds) * 1000000000 + nanos
+    match = re.fullmatch(r'(-?\d+)(' + _UNIT + ')?', literal)
+    return int(match.group(1)) * UNITS[match.group(2) or 'ns']
+
+
+def parse_duration(literal: str) -> int:
+    """
+    Convert an InfluxQL duration like ``30s``, ``1h30m`` or ``-5m`` to nanoseconds.
+    """
+    literal = literal.strip()
+    if not _DURATION.fullmatch(literal):
+        raise ValueError('invalid duration: ' + literal)
+    value = sum(int(n) * UNITS[unit] for n, unit in re.findall(r'(\d+)(' + _UNIT + ')', literal))
+    return -value if literal.startswith('-') else value
+
+
+def group_by_time(query: str) -> typing.Optional[typing.Tuple[int, int]]:
+    """
+    Return interval and offset in nanoseconds of ``GROUP BY time(...)``
+    or None if the query has no time grouping.
+    """
+    group = _GROUP_BY.search(query)
+    if group is None:
+        return None
+    match = _GROUP_BY_TIME.search(query, group.end())
+    if match is None:
+        return None
+    args = match.group(1).split(',')
+    try:
+        if len(args) > 2:
+            raise ValueError(match.group(0))
+        interval = parse_duration(args[0])
+        offset = parse_duration(args[1]) if len(args) == 2 else 0
+    except ValueError:
+        raise ValueError('can not split on ' + match.group(0))
+    if interval <= 0:
+        raise ValueError('can not split on ' + match.group(0))
+    return interval, offset
+
+
+def check_splittable(query: str):
+    """
+    Raise ``ValueError`` if the results of the query would change when
+    it is run over separate windows.
+    """
+    masked = _mask_strings(query)
+    if _SUBQUERY.search(masked):
+        raise ValueError('can not split queries with subqueries: ' + query)
+    if _LIMIT.search(masked):
+        raise ValueError('can not split queries with LIMIT or OFFSET: ' + query)
+    if _FILL_CARRY.search(masked):
+        raise ValueError('can not split fill(previous) or fill(linear): ' + query)
+    fields = _FIELDS.search(masked)
+    fields = fields.group(1) if fields else ''
+    functions = {f.lower() for f in _FUNCTION.findall(fields)}
+    if functions & CARRY_FUNCTIONS:
+        raise ValueError('can not split functions using previous values: ' + query)
+    if group_by_time(masked) is None:
+        if functions - ROW_FUNCTIONS or _DISTINCT.search(fields):
+            raise ValueError('can not split functions without GROUP BY time(...): ' + query)
+
+
+def _time_conditions(query: str) -> [re.Match]:
+    """
+    Return the lower and upper ``time`` condition of the WHERE clause.
+    Both must be at the top level of the clause, which may not contain a
+    top level OR.
+    """
+    masked = _mask_strings(query)
+    where = _WHERE.search(masked)
+    if where is None:
+        raise ValueError('query needs a lower and an upper time bound: ' + query)
+    end = _WHERE_END.search(masked, where.end())
+    end = end.start() if end else len(masked)
+
+    depth = 0
+    levels = []
+    for c in masked[where.end():end]:
+        if c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+        levels.append(depth)
+
+    def level(pos):
+        return levels[pos - where.end()]
+
+    if any(level(m.start()) == 0 for m in _OR.finditer(masked, where.end(), end)):
+        raise ValueError('can not split a WHERE clause with OR at the top level: ' + query)
+
+    lower = []
+    upper = []
+    for m in _TIME_CONDITION.finditer(masked, where.end(), end):
+        if level(m.start()) != 0:
+            raise ValueError('time conditions must be at the top level of WHERE: ' + query)
+        (lower if m.group(1).startswith('>') else upper).append(m)
+    if len(lower) != 1 or len(upper) != 1:
+        raise ValueError('query needs exactly one lower and one upper time bound: ' + query)
+    return lower + upper
+
+
+def time_range(query: str) -> (int, int):
+    """
+    Return the ``[start, end)`` range in nanoseconds of the ``time``
+    conditions in the query.
+    """
+    lower, upper = _time_conditions(query)
+    start = parse_time(query[lower.start(2):lower.end(2)])
+    if lower.group(1) == '>':
+        start += 1
+    end = parse_time(query[upper.start(2):upper.end(2)])
+    if upper.group(1) == '<=':
+        end += 1
+    return start, end
+
+
+def split_query(query: str, windows: int) -> [str]:
+    """
+    Split a query into at most ``windows`` queries over consecutive parts
+    of its time range. With ``GROUP BY time(...)`` the boundaries are
+    aligned to the interval so no bucket spans two windows. Raises
+    ``ValueError`` for queries that can't be split, see ``check_splittable``.
+    """
+    check_splittable(query)
+    start, end = time_range(query)
+    interval, offset = group_by_time(_mask_strings(query)) or (1, 0)
+    lower, upper = _time_conditions(query)
+
+    bounds = [start]
+    for i in range(1, windows):
+        bound = (start + (end - start) * i // windows - offset) // interval * interval + offset
+        if bounds[-1] < bound < end:
+            bounds.append(bound)
+    bounds.append(end)
+
+    queries = []
+    for window_start, window_end in zip(bounds, bounds[1:]):
+        queries.append(query[:lower.start()] + 'time >= {}'.format(window_start) +
+                       query[lower.end():upper.start()] + 'time < {}'.format(window_end) +
+                       query[upper.end():])
+    if _ORDER_DESC.search(query):
+        queries.reverse()
+    return queries
+
+
+def _series(result: dict) -> [dict]:
+    series = []
+    for statement in result.get('results', []):
+        if 'error' in statement:
+            raise QueryError(statement['error'])
+        series.extend(statement.get('series', []))
+    return series
+
+
+def iter_windows(influx, db: str, query: str, windows: int = 8, parallelism: int = 4,
+                 response_format: str = 'json') -> typing.Iterator[dict]:
+    """
+    Run the windows of a query with at most ``parallelism`` requests in
+    flight and yield their series in time order. Every yielded series holds
+    the rows of one window, so memory stays bounded by ``parallelism`` windows.
+
+    :param influx: an ``Influx`` instance
+    """
+    queries = split_query(query, windows)
+
+    def run(q):
+        return _series(influx.query_db(db, q, response_format).as_results())
+
+    with ThreadPoolExecutor(parallelism) as executor:
+        pending = collections.deque()
+        queries = iter(queries)
+        for q in itertools.islice(queries, parallelism):
+            pending.append(executor.submit(run, q))
+        while pending:
+            for series in pending.popleft().result():
+                yield series
+            q = next(queries, None)
+            if q is not None:
+                pending.append(executor.submit(run, q))
+
+
+def merge_series(series: typing.Iterable[dict]) -> dict:
+    """
+    Merge window series with the same name and tags into one result with
+    the structure of ``QueryResultOption.as_json()``.
+    """
+    merged = collections.OrderedDict()
+    for s in series:
+        key = (s['name'], tuple(sorted(s.get('tags', {}).items())))
+        if key in merged:
+            merged[key]['values'].extend(s['values'])
+        else:
+            merged[key] = dict(s, values=list(s['values']))
+    return {'results': [{'statement_id': 0, 'series': list(merged.values())}]}
+
+
+def query_windows(influx, db: str, query: str, windows: int = 8, parallelism: int = 4,
+                  response_format: str = 'json') -> dict:
+    """
+    Like ``iter_windows`` but returns the merged result.
+    """
+    return merge_series(iter_windows(influx, db, query, windows, parallelism, response_format))
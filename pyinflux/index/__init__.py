@@ -0,0 +1,155 @@
+"""
+In-memory series index over parsed lines.
+
+Measurement names, tag keys and tag values are interned to integer ids, a
+series is stored once as a packed array of those ids and gets a compact
+integer series id. An inverted index maps every measurement and
+``tag=value`` pair to the ascending array of series ids containing it.
+"""
+import typing
+from array import array
+from bisect import bisect_left
+
+from pyinflux.client import Line
+
+
+class StringTable:
+    """Interns strings to consecutive integer ids"""
+
+    def __init__(self):
+        self._ids = {}
+        self._strings = []
+
+    def intern(self, string: str) -> int:
+        id = self._ids.get(string)
+        if id is None:
+            id = self._ids[string] = len(self._strings)
+            self._strings.append(string)
+        return id
+
+    def get(self, string: str) -> typing.Optional[int]:
+        return self._ids.get(string)
+
+    def __getitem__(self, id: int) -> str:
+        return self._strings[id]
+
+    def __len__(self):
+        return len(self._strings)
+
+
+class SeriesIndex:
+    def __init__(self):
+        self.strings = StringTable()
+        self._series_ids = {}
+        self._series = []
+        self._measurements = {}
+        self._postings = {}
+        self._tag_values = {}
+
+    def add(self, line: Line) -> int:
+        """
+        Index the series of a line and return its series id.
+        """
+        intern = self.strings.intern
+        measurement = intern(line.key)
+        pairs = sorted((intern(k), intern(v)) for k, v in (line.tags or ()))
+        key = array('I', [measurement])
+        for pair in pairs:
+            key.extend(pair)
+        key = key.tobytes()
+
+        series_id = self._series_ids.get(key)
+        if series_id is not None:
+            return series_id
+        series_id = self._series_ids[key] = len(self._series)
+        self._series.append(key)
+
+        self._measurements.setdefault(measurement, array('I')).append(series_id)
+        for k, v in pairs:
+            self._postings.setdefault(k << 32 | v, array('I')).append(series_id)
+            self._tag_values.setdefault(k, set()).add(v)
+        return series_id
+
+    def add_lines(self, lines: typing.Iterable[Line]) -> int:
+        """
+        Index a stream of lines, returns the number of series in the index.
+        """
+        add = self.add
+        for line in lines:
+            add(line)
+        return len(self._series)
+
+    def series(self, series_id: int) -> (str, dict):
+        """Return measurement and tags of a series id"""
+        ids = array('I')
+        ids.frombytes(self._series[series_id])
+        strings = self.strings
+        return strings[ids[0]], {strings[ids[i]]: strings[ids[i + 1]] for i in range(1, len(ids), 2)}
+
+    def _posting(self, key: str, value: str) -> array:
+        k = self.strings.get(key)
+        v = self.strings.get(value)
+        if k is None or v is None:
+            return array('I')
+        return self._postings.get(k << 32 | v, array('I'))
+
+    def _matches(self, measurement: str = None, tags: dict = None) -> typing.Iterator[int]:
+        """
+        Intersect the sorted postings by walking the shortest one and
+        binary searching the others from their last position, nothing is copied.
+        """
+        postings = []
+        if measurement is not None:
+            m = self.strings.get(measurement)
+            postings.append(self._measurements.get(m, array('I')) if m is not None else array('I'))
+        for key, value in (tags or {}).items():
+            postings.append(self._posting(key, value))
+        if not postings:
+            yield from range(len(self._series))
+            return
+
+        postings.sort(key=len)
+        first, rest = postings[0], postings[1:]
+        positions = [0] * len(rest)
+        for series_id in first:
+            for i, posting in enumerate(rest):
+                pos = positions[i] = bisect_left(posting, series_id, positions[i])
+                if pos == len(posting):
+                    return
+                if posting[pos] != series_id:
+                    break
+            else:
+                yield series_id
+
+    def lookup(self, measurement: str = None, tags: dict = None) -> [int]:
+        """
+        Return the ascending series ids of a measurement whose tags match
+        all ``tags``. Without arguments all series ids are returned.
+        """
+        return list(self._matches(measurement, tags))
+
+    def cardinality(self, measurement: str = None, tags: dict = None) -> int:
+        """Number of series matching ``lookup(measurement, tags)``"""
+        if tags:
+            return sum(1 for _ in self._matches(measurement, tags))
+        if measurement is not None:
+            m = self.strings.get(measurement)
+            return len(self._measurements.get(m, ())) if m is not None else 0
+        return len(self._series)
+
+    def measurements(self) -> [str]:
+        return [self.strings[m] for m in self._measurements]
+
+    def tag_keys(self) -> [str]:
+        return [self.strings[k] for k in self._tag_values]
+
+    def tag_values(self, key: str) -> [str]:
+        k = self.strings.get(key)
+        return [self.strings[v] for v in self._tag_values.get(k, ())]
+
+    def tag_value_cardinality(self, key: str) -> int:
+        """Number of distinct values of a tag key"""
+        return len(self._tag_values.get(self.strings.get(key), ()))
+
+    def __len__(self):
+        return len(self._series)
@@ -0,0 +1,331 @@
+"""
+Bulk loader for line-protocol files.
+
+    python -m pyinflux.load --db test export.txt.gz
+
+The input (a file, a gzip file or ``-`` for stdin) is read as a stream, split
+into size-bounded batches and uploaded gzip-compressed over several
+keep-alive connections. The checkpoint file records the input offset up to
+which all batches are written, so an interrupted load can be resumed.
+"""
+import argparse
+import gzip
+import http.client
+import io
+import os
+import sys
+import threading
+import time
+import typing
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+class LoadError(Exception):
+    pass
+
+
+class Batch:
+    def __init__(self, start: int, end: int, lines: [bytes]):
+        """
+        :param start: input offset of the first line
+        :param end: input offset after the last line
+        """
+        self.start = start
+        self.end = end
+        self.lines = lines
+
+    @property
+    def body(self) -> bytes:
+        return b"\n".join(self.lines)
+
+    def __repr__(self):
+        return "<{} start={} end={} lines={}>".format(
+            self.__class__.__name__, self.start, self.end, len(self.lines))
+
+
+def open_input(path: str) -> typing.BinaryIO:
+    """
+    Open a file, a gzip file (detected by its magic bytes) or stdin for ``-``.
+    """
+    if path == '-':
+        fh = io.BufferedReader(sys.stdin.buffer)
+    else:
+        fh = open(path, 'rb')
+    if fh.peek(2)[:2] != GZIP_MAGIC:
+        return fh
+    if path == '-':
+        # GzipFile leaves stdin open
+        return gzip.GzipFile(fileobj=fh, mode='rb')
+    fh.close()
+    return gzip.open(path, 'rb')
+
+
+def skip_to(fh: typing.BinaryIO, offset: int):
+    """Advance an input stream to ``offset``, seeking where possible"""
+    if fh.seekable():
+        fh.seek(offset)
+        return
+    while offset > 0:
+        chunk = fh.read(min(offset, 1 << 20))
+        if not chunk:
+            raise LoadError('checkpoint offset beyond end of input')
+        offset -= len(chunk)
+
+
+def iter_batches(fh: typing.BinaryIO, max_bytes: int = 1 << 20, max_lines: int = 5000,
+                 offset: int = 0, validate: typing.Callable[[str], object] = None):
+    """
+    Split a line-protocol stream into batches of at most ``max_bytes`` and
+    ``max_lines``. Empty lines and comments are skipped, but stay inside
+    the offset range of a batch so consecutive batches cover the input
+    without gaps for ``Checkpoint``.
+
+    :param offset: input offset the stream is positioned at
+    :param validate: called with every decoded line, should raise on invalid input
+    """
+    lines = []
+    size = 0
+    start = offset
+    for raw in fh:
+        line_start = offset
+        offset += len(raw)
+        line = raw.strip()
+        if not line or line.startswith(b'#'):
+            continue
+        if validate is not None:
+            try:
+                validate(line.decode('utf-8'))
+            except Exception as e:
+                raise LoadError('invalid line at offset {}: {!r}'.format(line_start, line)) from e
+        if lines and (size + len(line) + 1 > max_bytes or len(lines) >= max_lines):
+            yield Batch(start, line_start, lines)
+            lines = []
+            size = 0
+            start = line_start
+        lines.append(line)
+        size += len(line) + 1
+    if lines:
+        yield Batch(start, offset, lines)
+
+
+class Checkpoint:
+    """
+    Tracks finished batches, which may complete out of order, and
+    stores the offset up to which every batch is written.
+    """
+
+    def __init__(self, path: str = None, offset: int = 0):
+        self.path = path
+        self.offset = offset
+        self._finished = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str):
+        offset = 0
+        if path and os.path.exists(path):
+            with open(path) as fh:
+                offset = int(fh.read().strip() or 0)
+        return cls(path, offset)
+
+    def done(self, batch: Batch):
+        with self._lock:
+            self._finished[batch.start] = batch.end
+            offset = self.offset
+            while offset in self._finished:
+                offset = self._finished.pop(offset)
+            if offset != self.offset:
+                self.offset = offset
+                self._save()
+
+    def _save(self):
+        if self.path:
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w') as fh:
+                fh.write(str(self.offset))
+            os.replace(tmp, self.path)
+
+
+class Progress:
+    def __init__(self, out: typing.TextIO = sys.stderr, interval: float = 1.0):
+        self.out = out
+        self.interval = interval
+        self.lines = 0
+        self.bytes = 0
+        self._started = time.monotonic()
+        self._reported = self._started
+        self._lock = threading.Lock()
+
+    def add(self, batch: Batch):
+        with self._lock:
+            self.lines += len(batch.lines)
+            self.bytes += batch.end - batch.start
+            now = time.monotonic()
+            if now - self._reported >= self.interval:
+                self._reported = now
+                self.report()
+
+    def report(self):
+        elapsed = max(time.monotonic() - self._started, 1e-9)
+        self.out.write("{} lines, {:.1f} MB, {:.0f} lines/s, {:.2f} MB/s\n".format(
+            self.lines, self.bytes / 1e6, self.lines / elapsed, self.bytes / 1e6 / elapsed))
+        self.out.flush()
+
+
+class Loader:
+    def __init__(self, db: str, host: str = 'localhost', port: int = 8086,
+                 username: str = None, password: str = None, precision: str = None,
+                 connections: int = 4, compresslevel: int = 6, timeout: float = 60):
+        """
+        :param connections: number of keep-alive connections uploading in parallel
+        """
+        self.host = host
+        self.port = port
+        self.connections = connections
+        self.compresslevel = compresslevel
+        self.timeout = timeout
+        params = {'db': db}
+        if precision:
+            params['precision'] = precision
+        if username and password:
+            params['u'] = username
+            params['p'] = password
+        self._path = '/write?' + urlencode(params)
+        self._local = threading.local()
+        self._open = []
+        self._open_lock = threading.Lock()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+            with self._open_lock:
+                self._open.append(conn)
+        return conn
+
+    def close(self):
+        """Close the keep-alive connections of all upload threads"""
+        with self._open_lock:
+            for conn in self._open:
+                conn.close()
+            self._open = []
+        self._local = threading.local()
+
+    def _reset(self, conn: http.client.HTTPConnection):
+        conn.close()
+        self._local.conn = None
+
+    def write(self, batch: Batch):
+        """
+        Write a batch, a reused keep-alive connection the server has closed
+        is retried once on a new connection. Writes are at-least-once: that
+        retry and resuming from a ``Checkpoint`` can send a batch the server
+        already applied. Lines with a timestamp overwrite themselves, lines
+        without one are stored twice.
+        """
+        body = gzip.compress(batch.body, self.compresslevel)
+        headers = {'Content-Encoding': 'gzip', 'Content-Type': 'text/plain; charset=utf-8'}
+        for attempt in (0, 1):
+            conn = self._connection()
+            reused = conn.sock is not None
+            try:
+                conn.request('POST', self._path, body, headers)
+            except (http.client.HTTPException, ConnectionError):
+                # reused keep-alive connection closed before the request was sent
+                self._reset(conn)
+                if attempt or not reused:
+                    raise
+                continue
+            try:
+                response = conn.getresponse()
+                data = response.read()
+                break
+            except http.client.RemoteDisconnected:
+                # closed idle keep-alive connection, the server sent nothing back
+                self._reset(conn)
+                if attempt or not reused:
+                    raise
+            except (http.client.HTTPException, ConnectionError):
+                self._reset(conn)
+                raise
+        if response.status != 204:
+            raise LoadError('write of {!r} failed with {} {}: {}'.format(
+                batch, response.status, response.reason, data.decode('utf-8', 'replace')))
+
+    def load(self, batches: typing.Iterable[Batch], checkpoint: Checkpoint = None,
+             progress: Progress = None):
+        """
+        Upload batches pipelined over ``connections`` connections. At most
+        two batches per connection are buffered ahead of the uploads.
+        """
+        slots = threading.BoundedSemaphore(self.connections * 2)
+        errors = []
+
+        def finished(future, batch):
+            # record the outcome before releasing the slot, so the submit
+            # loop sees an error before it sends another batch
+            try:
+                if future.exception() is not None:
+                    errors.append(future.exception())
+                    return
+                if checkpoint is not None:
+                    checkpoint.done(batch)
+                if progress is not None:
+                    progress.add(batch)
+            finally:
+                slots.release()
+
+        try:
+            with ThreadPoolExecutor(self.connections) as executor:
+                for batch in batches:
+                    slots.acquire()
+                    if errors:
+                        break
+                    future = executor.submit(self.write, batch)
+                    future.add_done_callback(lambda f, b=batch: finished(f, b))
+        finally:
+            self.close()
+        if errors:
+            raise errors[0]
+        if progress is not None:
+            progress.report()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m pyinflux.load',
+                                     description='Bulk load line-protocol into InfluxDB')
+    parser.add_argument('input', help="line-protocol file, gzip file or '-' for stdin")
+    parser.add_argument('--db', required=True)
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8086)
+    parser.add_argument('--username')
+    parser.add_argument('--password')
+    parser.add_argument('--precision', choices=['n', 'u', 'ms', 's', 'm', 'h'])
+    parser.add_argument('--batch-size', type=int, default=1 << 20, help='max uncompressed bytes per batch')
+    parser.add_argument('--batch-lines', type=int, default=5000, help='max lines per batch')
+    parser.add_argument('--connections', type=int, default=4)
+    parser.add_argument('--validate', action='store_true', help='check every line with pyinflux.parser')
+    parser.add_argument('--checkpoint', help='file storing the offset of written input, resumes from it')
+    args = parser.parse_args(argv)
+
+    validate = None
+    if args.validate:
+        from pyinflux.parser import LineParser
+        validate = LineParser.parse
+
+    checkpoint = Checkpoint.load(args.checkpoint)
+    loader = Loader(args.db, args.host, args.port, args.username, args.password,
+                    args.precision, args.connections)
+    with open_input(args.input) as fh:
+        skip_to(fh, checkpoint.offset)
+        batches = iter_batches(fh, args.batch_size, args.batch_lines, checkpoint.offset, validate)
+        try:
+            loader.load(batches, checkpoint, Progress())
+        except (LoadError, OSError, http.client.HTTPException) as e:
+            sys.stderr.write("{}\nresume from offset {}\n".format(e, checkpoint.offset))
+            return 1
+    return 0
@@ -0,0 +1,5 @@
+import sys
+
+from pyinflux.load import main
+
+sys.exit(main())
@@ -1,2 +1,5 @@
 from .test_parser import *
-from .test_client import *
\ No newline at end of file
+from .test_client import *
+from .test_load import *
+from .test_split import *
+from .test_index import *
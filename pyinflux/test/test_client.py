@@ -1,7 +1,11 @@
 import json
 import codecs
-from unittest import TestCase
-from pyinflux.client import Line, QueryResultOption
+from unittest import TestCase, skipIf
+from unittest.mock import patch
+from urllib.error import HTTPError
+from urllib.parse import parse_qs
+from pyinflux.client import Influx, Line, QueryResultOption, QueryBatch, QueryError
+from pyinflux.client.formats import HAVE_MSGPACK, decode_csv, decode_msgpack
 from io import BytesIO
 
 
@@ -34,3 +38,201 @@ class TestQueryResultOption(TestCase):
         qro = QueryResultOption(lambda: buf)
         self.assertEqual(json.dumps(testobject), qro.as_text())
         self.assertEqual(json.dumps(testobject), qro.as_text())
+
+    def test_csv(self):
+        # SELECT * FROM cpu GROUP BY host; SELECT * FROM empty; SELECT * FROM mem, disk
+        # the empty statement is left out, the column change of disk adds a header
+        buf = BytesIO(b'name,tags,time,value\r\n'
+                      b'cpu,"host=a,region=eu",10,1.5\r\n'
+                      b'cpu,"host=a,region=eu",20,2\r\n'
+                      b'cpu,host=b,10,\r\n'
+                      b'\r\n'
+                      b'name,tags,time,text\r\n'
+                      b'mem,,10,abc\r\n'
+                      b'\r\n'
+                      b'name,tags,time,free,used\r\n'
+                      b'disk,,10,1,2\r\n')
+        qro = QueryResultOption(lambda: buf, 'csv')
+        self.assertEqual({'results': [
+            {'statement_id': 0, 'series': [
+                {'name': 'cpu', 'tags': {'host': 'a', 'region': 'eu'},
+                 'columns': ['time', 'value'], 'values': [[10, 1.5], [20, 2]]},
+                {'name': 'cpu', 'tags': {'host': 'b'},
+                 'columns': ['time', 'value'], 'values': [[10, None]]},
+                {'name': 'mem', 'columns': ['time', 'text'], 'values': [[10, 'abc']]},
+                {'name': 'disk', 'columns': ['time', 'free', 'used'], 'values': [[10, 1, 2]]}]}]},
+            qro.as_results())
+
+    def test_csv_column_types(self):
+        result = decode_csv('name,tags,time,a,b,c\r\n'
+                            'cpu,,1,,1,1\r\n'
+                            'cpu,,2,1,1.5,x\r\n'
+                            'cpu,,3,2,2,true\r\n')
+        values = result['results'][0]['series'][0]['values']
+        self.assertEqual(values, [[1, None, 1, 1], [2, 1, 1.5, 'x'], [3, 2, 2.0, True]])
+        self.assertIsInstance(values[2][3], bool)
+        self.assertIsInstance(values[2][2], float)
+
+    def test_csv_empty(self):
+        self.assertEqual({'results': [{'statement_id': 0}]}, decode_csv(''))
+
+    def test_csv_error(self):
+        with self.assertRaisesRegex(QueryError, 'database not found: test'):
+            decode_csv('error\r\ndatabase not found: test\r\n')
+        with self.assertRaises(ValueError):
+            decode_csv('name,tags,time,value\r\ncpu\r\n')
+
+    MSGPACK_RESULT = {'results': [{'statement_id': 0, 'series': [
+        {'name': 'cpu', 'columns': ['time', 'value'],
+         'values': [[1500000000000000000, 1.5], [-3, None], [300, True]]}]}]}
+    # the first time is a time.Time extension (type 5) as written by InfluxDB
+    MSGPACK_DATA = (b'\x81\xa7results\x91\x82\xacstatement_id\x00\xa6series\x91'
+                    b'\x83\xa4name\xa3cpu\xa7columns\x92\xa4time\xa5value\xa6values\x93'
+                    b'\x92\xc7\x0c\x05\x00\x00\x00\x00\x59\x68\x2f\x00\x00\x00\x00\x00'
+                    b'\xcb\x3f\xf8\x00\x00\x00\x00\x00\x00'
+                    b'\x92\xfd\xc0'
+                    b'\x92\xcd\x01\x2c\xc3')
+
+    def test_msgpack(self):
+        self.assertEqual(self.MSGPACK_RESULT, decode_msgpack(self.MSGPACK_DATA, accelerated=False))
+        qro = QueryResultOption(lambda: BytesIO(self.MSGPACK_DATA), 'msgpack')
+        self.assertEqual(self.MSGPACK_RESULT, qro.as_results())
+
+    @skipIf(not HAVE_MSGPACK, 'msgpack is not installed')
+    def test_msgpack_accelerated(self):
+        self.assertEqual(self.MSGPACK_RESULT, decode_msgpack(self.MSGPACK_DATA))
+        # MessagePack timestamp extension (-1) and integer map keys
+        self.assertEqual({1: 1500000000000000001},
+                         decode_msgpack(b'\x81\x01\xc7\x0c\xff\x00\x00\x00\x01\x00\x00\x00\x00\x59\x68\x2f\x00'))
+        self.assertEqual({1: 1500000000000000001},
+                         decode_msgpack(b'\x81\x01\xc7\x0c\xff\x00\x00\x00\x01\x00\x00\x00\x00\x59\x68\x2f\x00',
+                                        accelerated=False))
+
+
+class TestInflux(TestCase):
+    def test_query_db(self):
+        with patch('pyinflux.client.urlopen', return_value=BytesIO(b'{"results": []}')) as urlopen:
+            self.assertEqual({'results': []}, Influx('localhost').query_db('test', 'SELECT 1', 'msgpack').as_json())
+        request = urlopen.call_args[0][0]
+        self.assertEqual(request.full_url, 'http://localhost:8086/query?db=test&epoch=ns&q=SELECT%201')
+        self.assertEqual(request.get_header('Accept'), 'application/x-msgpack')
+        self.assertIsNone(request.data)
+
+    def test_query_db_epoch(self):
+        with patch('pyinflux.client.urlopen', return_value=BytesIO(b'{"results": []}')) as urlopen:
+            urlopen.side_effect = lambda request: BytesIO(b'{"results": []}')
+            Influx('localhost').query_db('test', 'SELECT 1').as_json()
+            Influx('localhost').query_db('test', 'SELECT 1', epoch='ns').as_json()
+            Influx('localhost').execute('SHOW DATABASES', 'csv').as_text()
+        self.assertEqual([call[0][0].full_url for call in urlopen.call_args_list[:2]],
+                         ['http://localhost:8086/query?db=test&q=SELECT%201',
+                          'http://localhost:8086/query?db=test&epoch=ns&q=SELECT%201'])
+        self.assertEqual(parse_qs(urlopen.call_args[0][0].data.decode('utf-8')),
+                         {'epoch': ['ns'], 'q': ['SHOW DATABASES']})
+
+    def test_query_db_post(self):
+        query = 'SELECT * FROM cpu WHERE host = \'' + 'a' * Influx.MAX_GET_URL_LENGTH + '\''
+        with patch('pyinflux.client.urlopen', return_value=BytesIO(b'{"results": []}')) as urlopen:
+            Influx('localhost').query_db('test', query).as_json()
+        request = urlopen.call_args[0][0]
+        self.assertEqual(request.get_method(), 'POST')
+        self.assertEqual(request.full_url, 'http://localhost:8086/query')
+        self.assertEqual(parse_qs(request.data.decode('utf-8')),
+                         {'db': ['test'], 'q': [query]})
+
+
+class FakeInflux:
+    def __init__(self, response):
+        """
+        :param response: the response or a function of the query returning it
+        """
+        self.response = response
+        self.requests = []
+
+    def query_db(self, db, query, response_format='json'):
+        self.requests.append((db, query))
+
+        def get_fh():
+            response = self.response(query) if callable(self.response) else self.response
+            return BytesIO(json.dumps(response).encode('utf-8'))
+
+        return QueryResultOption(get_fh)
+
+    def execute(self, query, response_format='json'):
+        return self.query_db(None, query, response_format)
+
+
+class TestQueryBatch(TestCase):
+    def test_batch(self):
+        influx = FakeInflux({'results': [
+            {'statement_id': 0, 'series': [{'name': 'cpu', 'columns': ['time'], 'values': [[1]]}]},
+            {'statement_id': 1, 'error': 'measurement not found'},
+            {'statement_id': 2}]})
+        batch = QueryBatch(influx, 'db')
+        cpu = batch.add('SELECT * FROM cpu;')
+        missing = batch.add('SELECT * FROM missing')
+        empty = batch.add('SELECT * FROM empty', db='other')
+        self.assertEqual(influx.requests, [])
+
+        self.assertEqual(cpu.series(), [{'name': 'cpu', 'columns': ['time'], 'values': [[1]]}])
+        self.assertEqual(influx.requests, [('db', 'SELECT * FROM cpu;SELECT * FROM missing')])
+        self.assertEqual(missing.error, 'measurement not found')
+        with self.assertRaises(QueryError):
+            missing.result()
+        self.assertEqual(len(influx.requests), 1)
+
+        # statement 0 of the second group is answered by results[0]
+        self.assertEqual(empty.statement_id, 0)
+        self.assertEqual(len(empty.series()), 1)
+        self.assertEqual(influx.requests[1], ('other', 'SELECT * FROM empty'))
+
+    def test_request_error(self):
+        batch = QueryBatch(FakeInflux({'error': 'error parsing query'}), 'db')
+        first = batch.add('SELECT')
+        second = batch.add('SELECT * FROM cpu')
+        batch.execute()
+        self.assertEqual(first.error, 'error parsing query')
+        self.assertEqual(second.error, 'error parsing query')
+
+    def test_http_error(self):
+        def response(query):
+            if 'SELEC ' in query:
+                body = BytesIO(b'{"error": "error parsing query: found SELEC"}')
+                raise HTTPError('http://localhost:8086/query', 400, 'Bad Request', {}, body)
+            return {'results': [{'statement_id': i, 'series': []} for i in range(query.count(';') + 1)]}
+
+        influx = FakeInflux(response)
+        batch = QueryBatch(influx, 'db')
+        first = batch.add('SELECT * FROM cpu')
+        invalid = batch.add('SELEC * FROM cpu')
+        third = batch.add('SELECT * FROM mem')
+        self.assertEqual(invalid.error, 'error parsing query: found SELEC')
+        self.assertEqual(first.result(), {'statement_id': 0, 'series': []})
+        self.assertEqual(third.result(), {'statement_id': 2, 'series': []})
+        self.assertEqual(len(influx.requests), 4)
+
+    def test_not_executed(self):
+        def response(query):
+            queries = query.split(';')
+            results = []
+            for i, q in enumerate(queries):
+                if 'missing' in q:
+                    results.append({'statement_id': i, 'error': 'database not found: missing'})
+                    results.extend({'statement_id': j, 'error': 'not executed'}
+                                   for j in range(i + 1, len(queries)))
+                    break
+                results.append({'statement_id': i, 'series': [{'name': q}]})
+            return {'results': results}
+
+        influx = FakeInflux(response)
+        batch = QueryBatch(influx, 'db')
+        handles = [batch.add(q) for q in ('a', 'missing', 'b', 'c')]
+        self.assertEqual(handles[1].error, 'database not found: missing')
+        self.assertEqual([h.series() for h in (handles[0], handles[2], handles[3])],
+                         [[{'name': 'a'}], [{'name': 'b'}], [{'name': 'c'}]])
+        self.assertEqual(handles[3].result()['statement_id'], 3)
+        self.assertEqual(influx.requests, [('db', 'a;missing;b;c'), ('db', 'b;c')])
+
+    def test_csv_rejected(self):
+        with self.assertRaises(ValueError):
+            QueryBatch(FakeInflux({}), 'db', 'csv')
@@ -0,0 +1,59 @@
+from unittest import TestCase
+from pyinflux.client import Line
+from pyinflux.index import SeriesIndex, StringTable
+
+
+class TestStringTable(TestCase):
+    def test_intern(self):
+        table = StringTable()
+        self.assertEqual(table.intern('cpu'), 0)
+        self.assertEqual(table.intern('host'), 1)
+        self.assertEqual(table.intern('cpu'), 0)
+        self.assertEqual(table[1], 'host')
+        self.assertEqual(len(table), 2)
+        self.assertIsNone(table.get('mem'))
+
+
+class TestSeriesIndex(TestCase):
+    def setUp(self):
+        self.index = SeriesIndex()
+        self.index.add_lines([
+            Line('cpu', [('host', 'a'), ('region', 'eu')], [('value', 1)]),
+            Line('cpu', [('region', 'eu'), ('host', 'a')], [('value', 2)], 10),
+            Line('cpu', {'host': 'b', 'region': 'eu'}, {'value': 3}),
+            Line('mem', [('host', 'a')], [('value', 4)]),
+            Line('mem', None, [('value', 5)]),
+        ])
+
+    def test_series(self):
+        self.assertEqual(len(self.index), 4)
+        self.assertEqual(self.index.series(0), ('cpu', {'host': 'a', 'region': 'eu'}))
+        self.assertEqual(self.index.series(3), ('mem', {}))
+        self.assertEqual(self.index.add(Line('cpu', {'host': 'b', 'region': 'eu'}, {'value': 6})), 1)
+
+    def test_lookup(self):
+        self.assertEqual(self.index.lookup(), [0, 1, 2, 3])
+        self.assertEqual(self.index.lookup('cpu'), [0, 1])
+        self.assertEqual(self.index.lookup(tags={'host': 'a'}), [0, 2])
+        self.assertEqual(self.index.lookup('cpu', {'host': 'a', 'region': 'eu'}), [0])
+        self.assertEqual(self.index.lookup('cpu', {'host': 'c'}), [])
+        self.assertEqual(self.index.lookup('disk'), [])
+
+    def test_lookup_many(self):
+        index = SeriesIndex()
+        index.add_lines(Line('cpu', {'host': str(i % 7), 'core': str(i % 3), 'id': str(i)}, {'v': 1})
+                        for i in range(1000))
+        expected = [i for i in range(1000) if i % 7 == 2 and i % 3 == 1]
+        self.assertEqual(index.lookup('cpu', {'host': '2', 'core': '1'}), expected)
+        self.assertEqual(index.cardinality('cpu', {'host': '2', 'core': '1'}), len(expected))
+        self.assertEqual(index.lookup(tags={'host': '2', 'id': '9'}), [9])
+        self.assertEqual(index.cardinality(tags={'host': '2', 'id': '10'}), 0)
+
+    def test_cardinality(self):
+        self.assertEqual(self.index.cardinality(), 4)
+        self.assertEqual(self.index.cardinality('mem'), 2)
+        self.assertEqual(self.index.cardinality(tags={'region': 'eu'}), 2)
+        self.assertEqual(self.index.tag_value_cardinality('host'), 2)
+        self.assertEqual(sorted(self.index.tag_values('host')), ['a', 'b'])
+        self.assertEqual(self.index.measurements(), ['cpu', 'mem'])
+        self.assertEqual(self.index.tag_keys(), ['host', 'region'])
@@ -0,0 +1,137 @@
+import gc
+import gzip
+import http.client
+import os
+import tempfile
+import threading
+import warnings
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from io import BytesIO, StringIO
+from unittest import TestCase
+from pyinflux.load import Batch, Checkpoint, Loader, LoadError, Progress, iter_batches, open_input, skip_to
+
+DATA = b'cpu value=1\n\n# comment\ncpu value=2\ncpu value=3\ncpu value=4\n'
+
+
+class TestBatches(TestCase):
+    def test_max_lines(self):
+        batches = list(iter_batches(BytesIO(DATA), max_lines=2))
+        self.assertEqual([b.lines for b in batches],
+                         [[b'cpu value=1', b'cpu value=2'], [b'cpu value=3', b'cpu value=4']])
+        self.assertEqual([(b.start, b.end) for b in batches], [(0, 35), (35, 59)])
+
+    def test_max_bytes(self):
+        batches = list(iter_batches(BytesIO(DATA), max_bytes=30))
+        self.assertEqual([len(b.lines) for b in batches], [2, 2])
+        self.assertEqual(batches[0].body, b'cpu value=1\ncpu value=2')
+
+    def test_offset(self):
+        fh = BytesIO(DATA)
+        skip_to(fh, 35)
+        batches = list(iter_batches(fh, offset=35))
+        self.assertEqual([(b.start, b.end, len(b.lines)) for b in batches], [(35, 59, 2)])
+
+    def test_validate(self):
+        def validate(line):
+            if line.endswith('3'):
+                raise ValueError(line)
+
+        with self.assertRaises(LoadError):
+            list(iter_batches(BytesIO(DATA), validate=validate))
+
+    def test_gzip_input(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'data.gz')
+            with gzip.open(path, 'wb') as fh:
+                fh.write(DATA)
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always', ResourceWarning)
+                with open_input(path) as fh:
+                    self.assertEqual(fh.read(), DATA)
+                del fh
+                gc.collect()
+            self.assertEqual([w for w in caught if issubclass(w.category, ResourceWarning)], [])
+
+
+class TestCheckpoint(TestCase):
+    def test_out_of_order(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'checkpoint')
+            checkpoint = Checkpoint.load(path)
+            checkpoint.done(Batch(10, 20, []))
+            self.assertEqual(checkpoint.offset, 0)
+            checkpoint.done(Batch(0, 10, []))
+            self.assertEqual(checkpoint.offset, 20)
+            self.assertEqual(Checkpoint.load(path).offset, 20)
+
+    def test_export_header(self):
+        data = b'# INFLUXDB EXPORT\n# DML\ncpu value=1\ncpu value=2\n'
+        checkpoint = Checkpoint()
+        for batch in iter_batches(BytesIO(data), max_lines=1):
+            checkpoint.done(batch)
+        self.assertEqual(checkpoint.offset, 48)
+
+
+class WriteHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    received = []
+    status = 204
+    # close the connection without a response after this many requests
+    drop_after = None
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.received.append((self.path, gzip.decompress(body)))
+        if self.drop_after is not None and len(self.received) % self.drop_after == 0:
+            self.close_connection = True
+            return
+        self.send_response(self.status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class TestLoader(TestCase):
+    def run_loader(self, batches, connections=2, status=204, drop_after=None, checkpoint=None):
+        handler = type('Handler', (WriteHandler,), {'received': [], 'status': status,
+                                                    'drop_after': drop_after})
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            loader = Loader('test', '127.0.0.1', server.server_port, connections=connections)
+            loader.load(batches, checkpoint, Progress(StringIO()))
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+            self.received = handler.received
+
+    def test_load(self):
+        checkpoint = Checkpoint()
+        self.run_loader(iter_batches(BytesIO(DATA), max_lines=1), checkpoint=checkpoint)
+        self.assertEqual(checkpoint.offset, len(DATA))
+        self.assertEqual({path for path, body in self.received}, {'/write?db=test'})
+        self.assertEqual(sorted(body for path, body in self.received),
+                         [b'cpu value=1', b'cpu value=2', b'cpu value=3', b'cpu value=4'])
+
+    def test_error_stops_submitting(self):
+        batches = iter_batches(BytesIO(DATA * 10), max_lines=1)
+        with self.assertRaises(LoadError):
+            self.run_loader(batches, connections=1, status=500)
+        # at most the two buffered batches of the connection are sent
+        self.assertLessEqual(len(self.received), 2)
+
+    def test_retry_closed_keep_alive(self):
+        # the second request on the kept alive connection is dropped and retried
+        self.run_loader(iter_batches(BytesIO(DATA), max_lines=2), connections=1, drop_after=2)
+        self.assertEqual([body for path, body in self.received],
+                         [b'cpu value=1\ncpu value=2', b'cpu value=3\ncpu value=4',
+                          b'cpu value=3\ncpu value=4'])
+
+    def test_no_retry_on_new_connection(self):
+        with self.assertRaises(http.client.RemoteDisconnected):
+            self.run_loader(iter_batches(BytesIO(DATA)), connections=1, drop_after=1)
+        self.assertEqual(len(self.received), 1)
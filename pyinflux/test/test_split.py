@@ -0,0 +1,127 @@
+import re
+from unittest import TestCase
+from pyinflux.client import QueryError
+from pyinflux.client.split import (parse_time, parse_duration, group_by_time, time_range,
+                                   split_query, iter_windows, query_windows)
+
+
+class FakeResult:
+    def __init__(self, result):
+        self.result = result
+
+    def as_results(self):
+        return self.result
+
+
+class FakeInflux:
+    """Answers each window with one row per host at the window start"""
+
+    def __init__(self):
+        self.queries = []
+
+    def query_db(self, db, query, response_format='json'):
+        self.queries.append(query)
+        start = int(re.search(r'time >= (\d+)', query).group(1))
+        return FakeResult({'results': [{'statement_id': 0, 'series': [
+            {'name': 'cpu', 'tags': {'host': host}, 'columns': ['time', 'value'],
+             'values': [[start, host]]} for host in ('a', 'b')]}]})
+
+
+class TestSplit(TestCase):
+    def test_parse_time(self):
+        self.assertEqual(parse_time('10'), 10)
+        self.assertEqual(parse_time('10s'), 10000000000)
+        self.assertEqual(parse_time("'1970-01-01T00:00:01.5Z'"), 1500000000)
+        self.assertEqual(parse_time("'1970-01-02'"), 86400000000000)
+
+    def test_parse_duration(self):
+        self.assertEqual(parse_duration('30s'), 30000000000)
+        self.assertEqual(parse_duration('1h30m'), 5400000000000)
+        self.assertEqual(parse_duration('-5ms'), -5000000)
+        with self.assertRaises(ValueError):
+            parse_duration('now()')
+
+    def test_group_by_time(self):
+        self.assertIsNone(group_by_time("SELECT * FROM cpu GROUP BY host"))
+        self.assertEqual(group_by_time("SELECT mean(v) FROM cpu GROUP BY host, time(1h30m)"),
+                         (5400000000000, 0))
+        self.assertEqual(group_by_time("SELECT mean(v) FROM cpu GROUP BY time(30s, 5s)"),
+                         (30000000000, 5000000000))
+        with self.assertRaises(ValueError):
+            group_by_time("SELECT mean(v) FROM cpu GROUP BY time(30s, now())")
+
+    def test_time_range(self):
+        self.assertEqual(time_range("SELECT * FROM cpu WHERE time > 10 AND time <= 20"), (11, 21))
+        with self.assertRaises(ValueError):
+            time_range("SELECT * FROM cpu WHERE time > now() - 1h")
+
+    def test_split_query(self):
+        self.assertEqual(split_query("SELECT * FROM cpu WHERE host='a' AND time >= 0 AND time < 100", 2),
+                         ["SELECT * FROM cpu WHERE host='a' AND time >= 0 AND time < 50",
+                          "SELECT * FROM cpu WHERE host='a' AND time >= 50 AND time < 100"])
+
+    def test_split_query_group_by_time(self):
+        queries = split_query("SELECT mean(value) FROM cpu WHERE time >= 0s AND time < 100s "
+                              "GROUP BY time(30s), host", 3)
+        self.assertEqual([re.findall(r'\d+', q)[:3] for q in queries],
+                         [['0', '30000000000', '30'],
+                          ['30000000000', '60000000000', '30'],
+                          ['60000000000', '100000000000', '30']])
+
+    def test_split_query_group_by_offset(self):
+        queries = split_query("SELECT mean(value) FROM cpu WHERE time >= 0s AND time < 100s "
+                              "GROUP BY time(30s, 5s)", 3)
+        self.assertEqual([re.findall(r'time [<>]= ?(\d+)', q) for q in queries],
+                         [['0'], ['5000000000'], ['65000000000']])
+
+    def test_not_splittable(self):
+        for query in ["SELECT count(v) FROM cpu WHERE time >= 0 AND time < 100",
+                      "SELECT mean(v) FROM cpu WHERE time >= 0 AND time < 100 GROUP BY time(10s, now())",
+                      "SELECT * FROM cpu WHERE time >= 0 AND time < 100 LIMIT 10",
+                      "SELECT * FROM cpu WHERE time >= 0 AND time < 100 GROUP BY * SLIMIT 1",
+                      "SELECT max(v) FROM (SELECT * FROM cpu) WHERE time >= 0 AND time < 100",
+                      "SELECT derivative(mean(v)) FROM cpu WHERE time >= 0 AND time < 100 GROUP BY time(10s)",
+                      "SELECT non_negative_derivative(max(v), 1s) FROM cpu "
+                      "WHERE time >= 0 AND time < 100 GROUP BY time(10s)",
+                      "SELECT difference(v) FROM cpu WHERE time >= 0 AND time < 100",
+                      "SELECT cumulative_sum(sum(v)) FROM cpu WHERE time >= 0 AND time < 100 GROUP BY time(10s)",
+                      "SELECT moving_average(mean(v), 3) FROM cpu WHERE time >= 0 AND time < 100 GROUP BY time(10s)",
+                      "SELECT elapsed(v) FROM cpu WHERE time >= 0 AND time < 100",
+                      "SELECT integral(v) FROM cpu WHERE time >= 0 AND time < 100 GROUP BY time(10s)",
+                      "SELECT mean(v) FROM cpu WHERE time >= 0 AND time < 100 GROUP BY time(10s) fill(previous)",
+                      "SELECT mean(v) FROM cpu WHERE time >= 0 AND time < 100 GROUP BY time(10s) fill(linear)",
+                      "SELECT DISTINCT v FROM cpu WHERE time >= 0 AND time < 100",
+                      'SELECT "max"(v) FROM cpu WHERE time >= 0 AND time < 100',
+                      "SELECT * FROM cpu WHERE (time >= 0 AND time < 10) OR (time >= 50 AND time < 100)",
+                      "SELECT * FROM cpu WHERE time >= 0 AND time < 100 OR host = 'a'",
+                      "SELECT * FROM cpu WHERE time >= 0 AND time < 100 AND time < 50",
+                      "SELECT * FROM cpu WHERE time >= 0"]:
+            with self.assertRaises(ValueError, msg=query):
+                split_query(query, 3)
+        self.assertEqual(len(split_query("SELECT abs(v) FROM cpu WHERE time >= 0 AND time < 100", 3)), 3)
+
+    def test_split_query_strings(self):
+        self.assertEqual(split_query("SELECT * FROM cpu WHERE host = 'time > 5' AND time >= 0 AND time < 100 "
+                                     "AND (region = 'a' OR region = 'or')", 2),
+                         ["SELECT * FROM cpu WHERE host = 'time > 5' AND time >= 0 AND time < 50 "
+                          "AND (region = 'a' OR region = 'or')",
+                          "SELECT * FROM cpu WHERE host = 'time > 5' AND time >= 50 AND time < 100 "
+                          "AND (region = 'a' OR region = 'or')"])
+        self.assertEqual(time_range("SELECT * FROM cpu WHERE time < '1970-01-01T00:00:01Z' AND time > 10"),
+                         (11, 1000000000))
+
+    def test_query_windows(self):
+        influx = FakeInflux()
+        query = "SELECT * FROM cpu WHERE time >= 0 AND time < 40 GROUP BY host"
+        self.assertEqual(len(list(iter_windows(influx, 'db', query, 4, 2))), 8)
+        self.assertEqual(query_windows(influx, 'db', query, 4, 2), {'results': [{'statement_id': 0, 'series': [
+            {'name': 'cpu', 'tags': {'host': 'a'}, 'columns': ['time', 'value'],
+             'values': [[0, 'a'], [10, 'a'], [20, 'a'], [30, 'a']]},
+            {'name': 'cpu', 'tags': {'host': 'b'}, 'columns': ['time', 'value'],
+             'values': [[0, 'b'], [10, 'b'], [20, 'b'], [30, 'b']]}]}]})
+
+    def test_error(self):
+        influx = FakeInflux()
+        influx.query_db = lambda db, query, response_format: FakeResult({'results': [{'error': 'boom'}]})
+        with self.assertRaises(QueryError):
+            query_windows(influx, 'db', "SELECT * FROM cpu WHERE time >= 0 AND time < 40")
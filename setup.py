@@ -9,11 +9,14 @@ setup(name='pyinflux',
       author='Yves Fischer',
       author_email='yvesf+git@xapek.org',
       license="MIT",
-      packages=['pyinflux.client', 'pyinflux.parser'],
+      packages=['pyinflux', 'pyinflux.client', 'pyinflux.parser', 'pyinflux.load',
+                'pyinflux.index'],
+      entry_points={'console_scripts': ['pyinflux-load=pyinflux.load:main']},
       url='https://github.com/yvesf/pyinflux',
       install_requires=[],
       tests_require=['funcparserlib==0.3.6'],
-      extras_require={'parser': ['funcparserlib==0.3.6']},
+      extras_require={'parser': ['funcparserlib==0.3.6'],
+                      'msgpack': ['msgpack>=1.0']},
       classifiers=[
           "Programming Language :: Python",
           "Programming Language :: Python :: 3",